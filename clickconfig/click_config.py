@@ -32,6 +32,8 @@ Settings specific to one window are attributes of ClickConfigWindowHelper.
 
 """
 
+import bisect
+import errno
 import itertools
 import os
 import re
@@ -42,11 +44,19 @@ import gedit
 import gtk
 import gtksourceview2
 
-from .data import SelectionOp, ConfigSet, Config
-from .ui import ConfigUI
+from .data import SelectionOp, ConfigSet, Config, DEFAULT_LANGUAGES
 from .logger import Logger
 LOGGER = Logger(level=('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')[2])
 
+FLAG_LETTERS = ((re.I, 'I'), (re.M, 'M'), (re.S, 'S'), (re.X, 'X'))
+"""Regular expression flags and the letters shown for them in the menu."""
+
+DOC_WINDOW_CHARS = 65536
+"""Characters first searched on each side of a click for a multiline regex."""
+
+LINE_WINDOW_CHARS = 4096
+"""Characters first searched on each side of a click within a line."""
+
 class ClickConfigPlugin(gedit.Plugin):
     
     """
@@ -70,6 +80,12 @@ class ClickConfigPlugin(gedit.Plugin):
     update_configuration    -- The ConfigUI object calls this when Apply
                                or OK is clicked on the configuration
                                window.
+    update_ops_by_click     -- Looks up the SelectionOp of each click type
+                               for the current ConfigSet.  This is called
+                               when the configuration or ConfigSet changes.
+    get_menu_spec           -- Returns the menu actions and UI string.
+                               ClickConfigWindowHelper calls this to add
+                               the Click Config submenu to its window.
     open_config_dir         -- Opens a Nautilus window of the
                                configuration file's directory.  This is
                                called by the ConfigUI object when the
@@ -95,6 +111,15 @@ class ClickConfigPlugin(gedit.Plugin):
         
         self.conf = None
         """This object contains all the settings."""
+        
+        self._menu_spec = None
+        """The menu actions and UI string shared by all windows."""
+        
+        self._menu_signature = None
+        """The name, pattern, and flags of each op in self._menu_spec."""
+        
+        self.ops_by_click = {}
+        """The current ConfigSet's SelectionOp for each click type, or None."""
     
     def activate(self, window):
         """Start a ClickConfigWindowHelper instance for this gedit window."""
@@ -102,7 +127,6 @@ class ClickConfigPlugin(gedit.Plugin):
         if not self._instances:
             LOGGER.log('Click Config activating.')
             self.conf = Config(self)
-            self.set_conf_defaults()
             self.plugin_path = os.path.dirname(os.path.realpath(__file__))
             
             common_config_dir = os.path.expanduser('~/.config')
@@ -113,10 +137,18 @@ class ClickConfigPlugin(gedit.Plugin):
                 os.mkdir(config_dir)
             self.conf.filename = os.path.join(config_dir,
                                               'click_config_configs')
-            if os.path.exists(self.conf.filename):
+            try:
                 self.conf.load()
+            except IOError, io_error:
+                if io_error.errno != errno.ENOENT:
+                    raise
+                # There is no configuration file (yet).
+                self.set_conf_defaults()
+                # (Config.load compiles the ops it loads.)
+                self.conf.compile_ops()
             
             self.conf.check_language_configsets()
+            self.update_ops_by_click()
         self._instances[window] = ClickConfigWindowHelper(self, window)
         self._instances[window].activate()
     
@@ -127,6 +159,9 @@ class ClickConfigPlugin(gedit.Plugin):
         self._instances.pop(window)
         if not self._instances:
             self.conf = None
+            self._menu_spec = None
+            self._menu_signature = None
+            self.ops_by_click = {}
             self.config_ui = None
             self.plugin_path = None
             LOGGER.log('Click Config deactivated.')
@@ -147,13 +182,15 @@ class ClickConfigPlugin(gedit.Plugin):
         if self.config_ui:
             self.config_ui.window.present()
         else:
+            # The configuration window module is only needed once it opens.
+            from .ui import ConfigUI
             self.config_ui = ConfigUI(self)
         return self.config_ui.window
     
     def set_conf_defaults(self):
         """
         Set the configuration to initial default values.
-        These values get replaced if there is a configuration file.
+        These are only needed if there is no configuration file.
         """
         LOGGER.log()
         self.conf.ops = [
@@ -175,11 +212,10 @@ class ClickConfigPlugin(gedit.Plugin):
                 pattern='[_a-zA-Z][_a-zA-Z0-9]*',
                 preserved=True),
             SelectionOp('Paragraph',
-                pattern=('(?: ^ (?:  [ \\t]*  \\S+  [ \\t]*  )  +  \\n  )+'
-                 '  # \xe2\x9c\x94X allows comment'),
-                flags=(re.M + re.X)),
+                pattern='(?:^[ \\t]*\\S[^\\n\\r\\f\\v]*\\n)+',
+                flags=re.M),
             SelectionOp('Paragraph+',
-                pattern='(?:^(?:[ \\t]*\\S+[ \\t]*)+\\n)+(?:[ \\t]*\\n)?',
+                pattern='(?:^[ \\t]*\\S[^\\n\\r\\f\\v]*\\n)+(?:[ \\t]*\\n)?',
                 flags=re.M,
                 preserved=True),
             SelectionOp('Python name 2',
@@ -216,21 +252,105 @@ class ClickConfigPlugin(gedit.Plugin):
             ]
         self.conf.current_configset_name = 'Custom'
         self.conf.current_op_name = 'None'
-        self.conf.languages = {
-            '-None-': 'Click Config default',
-            'Python': 'Custom',
-            }
+        self.conf.languages = dict(DEFAULT_LANGUAGES)
         self.conf.is_set_by_language = False
     
     def update_configuration(self, conf):
         """Adopt the provided configuration and save it."""
         LOGGER.log()
         self.conf = conf
+        self.conf.compile_ops()
         self.conf.save()
-        for window in self._instances:
-            self._instances[window].update_menu()
+        self.update_ops_by_click()
+        # The menu only shows the ops, so it is kept if they are unchanged.
+        if self._get_menu_signature() != self._menu_signature:
+            self._menu_spec = None
+            for window in self._instances:
+                self._instances[window].update_menu()
         LOGGER.log('Configuration updated.')
     
+    def update_ops_by_click(self):
+        """
+        Look up the SelectionOp of each click type for the current ConfigSet,
+        so that clicks need not look them up through the configuration.
+        A click type assigned 'None' maps to None, as does every click type if
+        no ConfigSet has the current ConfigSet name.
+        """
+        LOGGER.log()
+        configset = self.conf.get_configset()
+        ops_by_click = {}
+        for click in range(1, 6):
+            op = None
+            if configset:
+                op = self.conf.get_op(click=click, configset=configset)
+            if op and op.name == 'None':
+                op = None
+            ops_by_click[click] = op
+        self.ops_by_click = ops_by_click
+    
+    def get_menu_spec(self):
+        """
+        Return the actions and the UI definition string for the Click Config
+        submenu.  They are the same for every window, so they are made once
+        for each configuration.  The action callbacks expect the window's
+        ClickConfigWindowHelper as their user data.
+        """
+        LOGGER.log()
+        if self._menu_spec:
+            return self._menu_spec
+        
+        actions = []
+        
+        name = 'ClickConfig'
+        stock_id = None
+        label = 'Click Config'
+        actions.append((name, stock_id, label))
+        
+        name = 'Configure'
+        stock_id = None
+        label = 'Configure'
+        accelerator = '<Control>b'
+        tooltip = 'Configure Click Config'
+        callback = lambda action, helper: helper.open_config_window()
+        actions.append((name, stock_id, label, accelerator, tooltip, callback))
+        
+        op_menuitems = []
+        # The first op is 'None'; the rest are listed sorted by name as in
+        # get_op_names, without looking each op up by name again.
+        for op in sorted(self.conf.ops[1:], key=lambda op: op.name):
+            name = op.name
+            stock_id = None
+            label = op.name
+            accelerator = ''
+            flag_text = ' '.join(letter for flag, letter in FLAG_LETTERS
+                                 if op.flags & flag) or '(None)'
+            tooltip = ('Select text at the cursor location: '
+                    'pattern = %s, flags = %s' % (repr(op.pattern), flag_text))
+            callback = lambda action, helper: helper._select_op(
+                        self.conf.get_op(op_name=action.get_name()))
+            action = (name, stock_id, label, accelerator, tooltip, callback)
+            actions.append(action)
+            op_menuitems.append('<menuitem action="%s"/>' % name)
+        
+        ui_str = """
+            <ui>
+              <menubar name="MenuBar">
+                <menu name="EditMenu" action="Edit">
+                  <placeholder name="EditOps_6">
+                    <menu action="ClickConfig">
+                      <menuitem action="Configure"/>
+                      <separator/>%s
+                    </menu>
+                  </placeholder>
+                </menu>
+              </menubar>
+            </ui>
+            """ % ''.join('\n' + ' ' * 22 + item for item in op_menuitems)
+        
+        self._menu_spec = actions, ui_str
+        self._menu_signature = self._get_menu_signature()
+        return self._menu_spec
+    
     def open_config_dir(self):
         """Open a Nautilus window of the configuration file's directory."""
         LOGGER.log()
@@ -278,6 +398,11 @@ class ClickConfigPlugin(gedit.Plugin):
             languages_by_section[section].sort(lambda a, b:
                                                 cmp(a.lower(), b.lower()))
         return languages_by_section
+    
+    def _get_menu_signature(self):
+        """Return the name, pattern, and flags of each op shown in the menu."""
+        LOGGER.log()
+        return [(op.name, op.pattern, op.flags) for op in self.conf.ops]
 
 class ClickConfigWindowHelper(object):
     
@@ -336,6 +461,13 @@ class ClickConfigWindowHelper(object):
         recent click for each of the five click types.
         """
         
+        self._press_handlers = {
+            gtk.gdk.BUTTON_PRESS: self._handle_1button_press,
+            gtk.gdk._2BUTTON_PRESS: self._handle_2button_press,
+            gtk.gdk._3BUTTON_PRESS: self._handle_3button_press,
+            }
+        """The button press handler for each type of button press event."""
+        
         gtk_settings = gtk.settings_get_default()
         gtk_doubleclick_ms = gtk_settings.get_property('gtk-double-click-time')
         self._double_click_time = float(gtk_doubleclick_ms)/1000
@@ -361,8 +493,12 @@ class ClickConfigWindowHelper(object):
         # These attributes are used for extending the selection for click-drag.
         self._word_re = None
         """The compiled regular expression object of the current click."""
+        self._is_windowed = True
+        """Whether the current click's regex is searched in a window."""
         self._boundaries = None
         """All start and end positions of matches of the current click."""
+        self._boundaries_range = None
+        """The start and end positions of the text searched for boundaries."""
         self._click_start_iter = None
         """Start iter of the clicked selection."""
         self._click_end_iter = None
@@ -372,61 +508,14 @@ class ClickConfigWindowHelper(object):
         """Create the Click Config submenu under the Edit menu."""
         LOGGER.log()
         
-        actions = []
-        
-        name = 'ClickConfig'
-        stock_id = None
-        label = 'Click Config'
-        actions.append((name, stock_id, label))
-        
-        name = 'Configure'
-        stock_id = None
-        label = 'Configure'
-        accelerator = '<Control>b'
-        tooltip = 'Configure Click Config'
-        callback = lambda action: self.open_config_window()
-        actions.append((name, stock_id, label, accelerator, tooltip, callback))
-        
-        op_menuitems = ''
-        for op_name in self._plugin.conf.get_op_names()[1:]:
-            # Iterating get_op_names ensures that the names are sorted.
-            op = self._plugin.conf.get_op(op_name=op_name)
-            name = op.name
-            stock_id = None
-            label = op.name
-            accelerator = ''
-            flag_text =  ' I' * bool(op.flags & re.I)
-            flag_text += ' M' * bool(op.flags & re.M)
-            flag_text += ' S' * bool(op.flags & re.S)
-            flag_text += ' X' * bool(op.flags & re.X)
-            flag_text = flag_text or '(None)'
-            tooltip = ('Select text at the cursor location: '
-                    'pattern = %s, flags = %s' % (repr(op.pattern), flag_text))
-            callback = lambda action: self._select_op(
-                        self._plugin.conf.get_op(op_name=action.get_name()))
-            action = (name, stock_id, label, accelerator, tooltip, callback)
-            actions.append(action)
-            op_menuitems += '\n' + ' ' * 22 + '<menuitem action="%s"/>' % name
+        actions, ui_str = self._plugin.get_menu_spec()
         
         self._action_group = gtk.ActionGroup("ClickConfigPluginActions")
-        self._action_group.add_actions(actions)
+        # The action callbacks get this object as their user data.
+        self._action_group.add_actions(actions, self)
         manager = self._window.get_ui_manager()
         manager.insert_action_group(self._action_group, -1)
         
-        ui_str = """
-            <ui>
-              <menubar name="MenuBar">
-                <menu name="EditMenu" action="Edit">
-                  <placeholder name="EditOps_6">
-                    <menu action="ClickConfig">
-                      <menuitem action="Configure"/>
-                      <separator/>%s
-                    </menu>
-                  </placeholder>
-                </menu>
-              </menubar>
-            </ui>
-            """ % op_menuitems
         self._ui_id = manager.add_ui_from_string(ui_str)
     
         LOGGER.log('Menu added for %s' % self._window)
@@ -465,6 +554,7 @@ class ClickConfigWindowHelper(object):
         self._remove_menu()
         self._last_click = None
         self._double_click_time = None
+        self._press_handlers = None
         self._plugin = None
         LOGGER.log('Click Config deactivated for %s' % self._window)
         self._window = None
@@ -507,7 +597,11 @@ class ClickConfigWindowHelper(object):
                 LOGGER.log('Language detected: %s' % language)
                 if language in self._plugin.conf.languages:
                     configset_name = self._plugin.conf.languages[language]
-                    self._plugin.conf.current_configset_name = configset_name
+                    if (configset_name !=
+                            self._plugin.conf.current_configset_name):
+                        self._plugin.conf.current_configset_name = \
+                            configset_name
+                        self._plugin.update_ops_by_click()
                     LOGGER.log('ConfigSet selected: %s' %
                                              configset_name)
             self._action_group.set_sensitive(True)
@@ -559,11 +653,11 @@ class ClickConfigWindowHelper(object):
     def _get_scrollwin_views(self, scrollwin):
         """Return the View(s) in the ScrolledWindow."""
         child = scrollwin.get_child()
-        if type(child).__name__ == 'View':
+        if isinstance(child, gtksourceview2.View):
             # the view within the normal GUI structure.
             view = child
             return [view]
-        elif type(child).__name__ == 'Viewport':
+        elif isinstance(child, gtk.Viewport):
             # views within Split View's GUI structure.
             viewport = child
             vbox = viewport.get_child()
@@ -580,7 +674,7 @@ class ClickConfigWindowHelper(object):
     def on_scrollwin_add(self, scrollwin, widget, window):
         """Call update_ui to add any new view added by Split View"""
         LOGGER.log()
-        if type(widget).__name__ == 'Viewport':
+        if isinstance(widget, gtk.Viewport):
             viewport = widget
             vbox = viewport.get_child()
             if vbox:
@@ -678,7 +772,7 @@ class ClickConfigWindowHelper(object):
         
         drag_iter = self._get_click_iter(view, event)
         
-        # self._word_re will be used
+        # self._word_re and self._is_windowed will be used
         self._select_regex(drag_iter, word_re=None, extend=True)
     
     def _disconnect_drag_handler(self, view):
@@ -695,30 +789,31 @@ class ClickConfigWindowHelper(object):
         # Clear the match data of the click.
         self._word_re = None
         self._boundaries = None
+        self._boundaries_range = None
         self._click_start_iter = None
         self._click_end_iter = None
     
     def _disconnect_scrollwin_handlers(self):
         """Disconnect any remaining ScrolledWindow event handlers."""
         LOGGER.log()
-        for scrollwin in self._handlers_per_scrollwin.keys():
-            handler_id = self._handlers_per_scrollwin.pop(scrollwin)
+        while self._handlers_per_scrollwin:
+            scrollwin, handler_id = self._handlers_per_scrollwin.popitem()
             if scrollwin.handler_is_connected(handler_id):
                 scrollwin.disconnect(handler_id)
     
     def _disconnect_viewport_handlers(self):
         """Disconnect any remaining Viewport event handlers."""
         LOGGER.log()
-        for viewport in self._handlers_per_viewport.keys():
-            handler_id = self._handlers_per_viewport.pop(viewport)
+        while self._handlers_per_viewport:
+            viewport, handler_id = self._handlers_per_viewport.popitem()
             if viewport.handler_is_connected(handler_id):
                 viewport.disconnect(handler_id)
     
     def _disconnect_mouse_handlers(self):
         """Disconnect from mouse signals from all views in the window."""
         LOGGER.log()
-        for view in self._mouse_handler_ids_per_view.keys():
-            handler_id = self._mouse_handler_ids_per_view.pop(view)
+        while self._mouse_handler_ids_per_view:
+            view, handler_id = self._mouse_handler_ids_per_view.popitem()
             if view.handler_is_connected(handler_id):
                 view.disconnect(handler_id)
     
@@ -729,15 +824,11 @@ class ClickConfigWindowHelper(object):
         """
         LOGGER.log()
         handled = False
-        if event.button == 1:
+        press_handler = self._press_handlers.get(event.type)
+        if event.button == 1 and press_handler:
             click_iter = self._get_click_iter(view, event)
             now = time.time()
-            handlers_by_type = {
-                gtk.gdk.BUTTON_PRESS: self._handle_1button_press,
-                gtk.gdk._2BUTTON_PRESS: self._handle_2button_press,
-                gtk.gdk._3BUTTON_PRESS: self._handle_3button_press,
-                }
-            handled, click = handlers_by_type[event.type](click_iter, now)
+            handled, click = press_handler(click_iter, now)
             if click:
                 handled = self._make_assigned_selection(click, click_iter)
                 if handled:
@@ -756,24 +847,26 @@ class ClickConfigWindowHelper(object):
         LOGGER.log()
         handled = False
         click = None
-        if self._last_click[0] and click_iter.equal(self._last_click[0]):
+        last_click = self._last_click
+        if last_click[0] and click_iter.equal(last_click[0]):
             # The pointer must remain in the same position as the first click,
             # for it to be considered a successive click of a multiple click.
-            if now - self._last_click[4] < self._double_click_time:
+            double_click_time = self._double_click_time
+            if now - last_click[4] < double_click_time:
                 LOGGER.log('Quintuple-click.')
                 # QUINTUPLE-CLICKS are handled here.
-                self._last_click[5] = now
+                last_click[5] = now
                 click = 5
-            elif now - self._last_click[3] < self._double_click_time:
+            elif now - last_click[3] < double_click_time:
                 LOGGER.log('Quadruple-click.')
                 # QUADRUPLE-CLICKS are handled here.
-                self._last_click[4] = now
+                last_click[4] = now
                 click = 4
-            elif now - self._last_click[2] < self._double_click_time:
+            elif now - last_click[2] < double_click_time:
                 LOGGER.log('(3rd click of a triple-click.)', level='debug')
                 # Ignore and consume it.  Triple-clicks are not handled here.
                 handled = True
-            elif now - self._last_click[1] < self._double_click_time:
+            elif now - last_click[1] < double_click_time:
                 LOGGER.log('(2nd click of a double-click.)', level='debug')
                 # Ignore and consume it.  Double-clicks are not handled here.
                 handled = True
@@ -790,15 +883,16 @@ class ClickConfigWindowHelper(object):
         LOGGER.log()
         handled = False
         click = None
-        if self._last_click[0] and click_iter.equal(self._last_click[0]):
-            if (now - self._last_click[4]) < self._double_click_time:
+        last_click = self._last_click
+        if last_click[0] and click_iter.equal(last_click[0]):
+            if (now - last_click[4]) < self._double_click_time:
                 LOGGER.log('(4th & 5th of a quintuple-click.)', level='debug')
                 # Ignore and consume it.  Quintuple-clicks are not handled here.
                 handled = True
             else:
                 LOGGER.log('Double-click.')
                 # DOUBLE-CLICKS are handled here.
-                self._last_click[2] = now
+                last_click[2] = now
                 click = 2
         return handled, click
     
@@ -807,15 +901,16 @@ class ClickConfigWindowHelper(object):
         LOGGER.log()
         handled = False
         click = None
-        if self._last_click[0] and click_iter.equal(self._last_click[0]):
-            if (now - self._last_click[5]) < self._double_click_time:
+        last_click = self._last_click
+        if last_click[0] and click_iter.equal(last_click[0]):
+            if (now - last_click[5]) < self._double_click_time:
                 LOGGER.log('(4th-6th of a sextuple-click.)', level='debug')
                 # Ignore and consume it.  Sextuple-clicks are not handled here.
                 handled = True
             else:
                 LOGGER.log('Triple-click.')
                 # TRIPLE-CLICKS are handled here.
-                self._last_click[3] = now
+                last_click[3] = now
                 click = 3
         return handled, click
     
@@ -841,8 +936,8 @@ class ClickConfigWindowHelper(object):
         """Select text based on the click type and location."""
         LOGGER.log()
         acted = False
-        op = self._plugin.conf.get_op(click=click)
-        if op.name != 'None':
+        op = self._plugin.ops_by_click.get(click)
+        if op:
             acted = self._select_op(op, click_iter=click_iter)
         return acted
     
@@ -852,50 +947,48 @@ class ClickConfigWindowHelper(object):
         """Finds first regex match that includes the click position."""
         LOGGER.log()
         
-        char_spec = op.pattern
-        flags = op.flags
-        
         LOGGER.log('Selection name: %s' % op.name)
         
         if not click_iter:
             click_iter = self._get_insert_iter()
         
-        word_re = re.compile(char_spec, flags)
+        word_re = op.compiled
+        if word_re is None:
+            return False
         
-        did_select = self._select_regex(click_iter, word_re)
+        did_select = self._select_regex(
+            click_iter, word_re, is_windowed=not op.is_position_dependent)
         return did_select
     
-    def _select_regex(self, click_iter, word_re, extend=False):
+    def _select_regex(self, click_iter, word_re, extend=False,
+                      is_windowed=True):
         """
         Select text in the document matching word_re and containing click_iter.
+        If is_windowed is False, word_re is searched in the whole text rather
+        than in a window around click_iter.
         """
         LOGGER.log()
         if word_re is None:
             word_re = self._word_re
+            is_windowed = self._is_windowed
         else:
             self._word_re = word_re
+            self._is_windowed = is_windowed
         doc = self._window.get_active_document()
         multiline = bool(word_re.flags & re.M)
-        if multiline:
-            source_start_iter, source_end_iter = doc.get_bounds()
-            pick_pos = click_iter.get_offset()
-        else:
-            source_start_iter, source_end_iter = \
-                self._get_line_iter_pair(click_iter)
-            pick_pos = click_iter.get_line_offset()
-        source_text = source_start_iter.get_slice(source_end_iter)
+        text_range = self._find_text(click_iter, word_re, is_windowed)
         # There is nothing to select in an empty text.
-        if source_text == "":
+        if not text_range:
             return False
-        match_start, match_end = self._find_text(source_text, pick_pos, word_re)
+        match_start, match_end = text_range
         target_start_iter = click_iter.copy()
-        target_end_iter = click_iter.copy()
         if multiline:
             target_start_iter.set_offset(match_start)
-            target_end_iter.set_offset(match_end)
         else:
             target_start_iter.set_line_offset(match_start)
-            target_end_iter.set_line_offset(match_end)
+        # Moving on from the start is cheaper than locating the end afresh.
+        target_end_iter = target_start_iter.copy()
+        target_end_iter.forward_chars(match_end - match_start)
         if extend:
             target_start_iter = min((self._click_start_iter,
                                     target_start_iter),
@@ -923,25 +1016,81 @@ class ClickConfigWindowHelper(object):
 #        doc.set_search_text(found_text, 1)
         return True
     
-    def _find_text(self, source_text, pick_pos, word_re):
+    def _find_text(self, click_iter, word_re, is_windowed=True):
         """
         Finds the range of the match, or the range between matches, for regex
-        word_re within source_text that includes the position pick_pos.
-        If there is no match, then the whole document is selected as being
+        word_re that includes the position of click_iter.
+        If there is no match, then the whole text is selected as being
         between matches.
+        The text is the document for a multiline regex, giving document
+        offsets, or else the line of click_iter, giving line offsets.
+        Returns None if the text is empty.
+        
+        Only a window of the text around click_iter is searched, starting
+        with about DOC_WINDOW_CHARS or LINE_WINDOW_CHARS on each side.  If
+        the range found reaches an edge of the window, where the window may
+        have cut a match short, the window is doubled on that side and
+        searched again.  A regex whose matches depend on where the search
+        starts (see SelectionOp.is_position_dependent) is given
+        is_windowed=False, and the whole text is searched instead.
         """
         LOGGER.log()
         
+        if word_re.flags & re.M:
+            pick_pos = click_iter.get_offset()
+            text_length = click_iter.get_buffer().get_char_count()
+            window_chars = DOC_WINDOW_CHARS
+        else:
+            pick_pos = click_iter.get_line_offset()
+            line_end_iter = self._get_line_iter_pair(click_iter)[1]
+            text_length = line_end_iter.get_line_offset()
+            window_chars = LINE_WINDOW_CHARS
+        if text_length == 0:
+            return None
+        if not is_windowed:
+            window_chars = text_length
+        
         # self._boundaries is set by a click selection,
         # remains available for a click-drag selection,
         # and then is set to None by self._disconnect_drag_handler().
-        if not self._boundaries:
-            self._find_boundaries(source_text, word_re)
-        
-        after = next((p for p in self._boundaries if p > pick_pos),
-                     len(source_text))
-        after_index = self._boundaries.index(after)
-        before = self._boundaries[after_index - 1]
+        if self._boundaries:
+            window_start, window_end = self._boundaries_range
+            if not window_start <= pick_pos <= window_end:
+                self._boundaries = None
+        reach_back = reach_forward = window_chars
+        while True:
+            if not self._boundaries:
+                source_text, window_start, window_end = \
+                    self._get_text_window(click_iter, word_re,
+                                          max(0, pick_pos - reach_back),
+                                          min(text_length,
+                                              pick_pos + reach_forward))
+                # Multiline boundaries are kept for click-drag selecting,
+                # so only single-line searches can stop after pick_pos.
+                stop_pos = None if word_re.flags & re.M else pick_pos
+                self._find_boundaries(source_text, word_re, window_start,
+                                      stop_pos)
+                self._boundaries_range = window_start, window_end
+            window_start, window_end = self._boundaries_range
+            
+            # The boundaries are sorted, so bisect finds the first one past
+            # pick_pos instead of scanning the whole list for it.
+            after_index = bisect.bisect_right(self._boundaries, pick_pos)
+            if after_index == len(self._boundaries):
+                # pick_pos is at the end of the window.
+                after_index = bisect.bisect_left(self._boundaries, window_end)
+            after = self._boundaries[after_index]
+            before = self._boundaries[after_index - 1]
+            
+            is_cut_back = 0 < window_start == before
+            is_cut_forward = after == window_end < text_length
+            if not (is_cut_back or is_cut_forward):
+                break
+            self._boundaries = None
+            if is_cut_back:
+                reach_back *= 2
+            if is_cut_forward:
+                reach_forward *= 2
         
         # For single-line regexes, the boundaries
         # need to be determined each time.
@@ -950,15 +1099,52 @@ class ClickConfigWindowHelper(object):
         
         return before, after
     
-    def _find_boundaries(self, source_text, word_re):
-        """Find the offsets of all match starting and ending positions."""
+    def _get_text_window(self, click_iter, word_re, start, end):
+        """
+        Return the text between offsets start and end, which are document
+        offsets for a multiline regex or else line offsets of click_iter,
+        along with the start and end offsets of the text returned.
+        The text is returned as unicode.
+        For a multiline regex, the text is widened to whole lines so that
+        line-based patterns like '^' and '\\n' match as they would in the
+        whole document.
+        """
+        LOGGER.log()
+        if word_re.flags & re.M:
+            doc = click_iter.get_buffer()
+            start_iter = doc.get_iter_at_offset(start)
+            start_iter.set_line_offset(0)
+            end_iter = doc.get_iter_at_offset(end)
+            if not end_iter.starts_line():
+                end_iter.forward_line()
+            start = start_iter.get_offset()
+            end = end_iter.get_offset()
+        else:
+            start_iter = click_iter.copy()
+            start_iter.set_line_offset(start)
+            end_iter = start_iter.copy()
+            end_iter.forward_chars(end - start)
+        # Decoding the UTF-8 slice gives a unicode string whose indexes are
+        # character offsets, the same as the offsets of the iters.
+        return start_iter.get_slice(end_iter).decode('utf-8'), start, end
+    
+    def _find_boundaries(self, source_text, word_re, offset=0, stop_pos=None):
+        """
+        Find the offsets of all match starting and ending positions,
+        counting from offset as the start of source_text.
+        If stop_pos is given, stop at the first match starting after it,
+        as no later match can contain it.
+        """
         LOGGER.log()
         
-        spans = ((m.start(), m.end()) for m in word_re.finditer(source_text))
+        spans = ((m.start() + offset, m.end() + offset)
+                 for m in word_re.finditer(source_text))
+        if stop_pos is not None:
+            spans = self._spans_until(spans, stop_pos)
         boundaries = list(itertools.chain.from_iterable(spans))
         
-        source_start = 0
-        source_end = len(source_text)
+        source_start = offset
+        source_end = offset + len(source_text)
         
         if boundaries:
             if boundaries[0] != source_start:
@@ -970,6 +1156,13 @@ class ClickConfigWindowHelper(object):
         
         self._boundaries = boundaries
     
+    def _spans_until(self, spans, stop_pos):
+        """Yield the spans through the first one starting after stop_pos."""
+        for span in spans:
+            yield span
+            if span[0] > stop_pos:
+                break
+    
     def _get_line_iter_pair(self, a_text_iter):
         """Return iters for the start and end of this iter's line."""
         LOGGER.log()
@@ -29,13 +29,34 @@ Config -- the whole store of configuration data for Click_Config
 
 import copy
 import os
+import re
 import shutil
 import sys
 
 from .dictfile import read_dict_from_file, write_dict_to_file
 from .logger import Logger
+from .regex_window import regex_is_position_dependent
 LOGGER = Logger(level=('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')[2])
 
+DEFAULT_LANGUAGES = {
+    '-None-': 'Click Config default',
+    'Python': 'Custom',
+    }
+"""Initial language assignments, also used for configs from before 1.1."""
+
+UPGRADED_PATTERNS = {
+    ('(?: ^ (?:  [ \\t]*  \\S+  [ \\t]*  )  +  \\n  )+'
+     '  # \xe2\x9c\x94X allows comment', re.M | re.X):
+        ('(?:^[ \\t]*\\S[^\\n\\r\\f\\v]*\\n)+', re.M),
+    ('(?:^(?:[ \\t]*\\S+[ \\t]*)+\\n)+(?:[ \\t]*\\n)?', re.M):
+        ('(?:^[ \\t]*\\S[^\\n\\r\\f\\v]*\\n)+(?:[ \\t]*\\n)?', re.M),
+    }
+"""
+Default (pattern, flags) of earlier versions, mapped to equivalent ones.
+The old Paragraph patterns nest quantifiers and can backtrack for seconds on
+a last line without a newline.
+"""
+
 class SelectionOp(object):
     
     """
@@ -70,6 +91,15 @@ class SelectionOp(object):
         self.preserved = False
         """Read-only flag for ConfigUI to check before modifying.)."""
         
+        self._compiled = None
+        """Compiled regular expression object, made on first use."""
+        
+        self._compiled_key = None
+        """The (pattern, flags) that self._compiled was compiled from."""
+        
+        self._is_position_dependent = True
+        """Whether the compiled regex must be searched in the whole text."""
+        
         if isinstance(name_or_dict, dict):
             dictionary = name_or_dict
             self.from_dict(dictionary)
@@ -80,6 +110,43 @@ class SelectionOp(object):
             self.flags = flags
             self.preserved = preserved
     
+    @property
+    def compiled(self):
+        """
+        Return the compiled regular expression for the pattern and flags,
+        or None if the pattern is invalid.
+        It is compiled on first access and again only if the pattern or flags
+        have changed since, so an invalid pattern is only logged once.
+        The pattern is compiled as unicode, to match the document text.
+        """
+        key = (self.pattern, self.flags)
+        if key != self._compiled_key:
+            self._compiled_key = key
+            pattern = self.pattern
+            try:
+                if isinstance(pattern, str):
+                    pattern = pattern.decode('utf-8')
+                self._compiled = re.compile(pattern, self.flags)
+                self._is_position_dependent = regex_is_position_dependent(
+                    pattern, self.flags)
+            except (re.error, UnicodeDecodeError), error:
+                self._compiled = None
+                self._is_position_dependent = True
+                LOGGER.log('Invalid pattern for SelectionOp %r: %s' %
+                           (self.name, error), level='warning')
+        return self._compiled
+    
+    @property
+    def is_position_dependent(self):
+        """
+        Return True if the regex must be searched in the whole line or
+        document rather than in a window around the click.
+        This is determined once, when the regex is compiled.
+        """
+        # Accessing the property brings the compiled regex up to date.
+        self.compiled
+        return self._is_position_dependent
+    
     def copy_as(self, name):
         """Return a copy of the SelectionOp with a new name."""
         LOGGER.log()
@@ -151,6 +218,10 @@ class SelectionOp(object):
         self.pattern = dictionary['pattern']
         self.flags = dictionary['flags']
         self.preserved = dictionary['preserved']
+        # Saved copies of old default patterns match the same text as their
+        # replacements, so upgrading them cannot change a user's selections.
+        self.pattern, self.flags = UPGRADED_PATTERNS.get(
+            (self.pattern, self.flags), (self.pattern, self.flags))
 
 class ConfigSet(object):
     
@@ -410,10 +481,15 @@ class Config(object):
             [SelectionOp(dict_) for dict_ in dictionary['ops']]
         # The following are conditional because they would not be in
         # Click_Config a config file from before version 1.1.
+        # Missing ones keep the values a new configuration would get.
         if 'languages' in dictionary:
             self.languages = dictionary['languages']
+        else:
+            self.languages = dict(DEFAULT_LANGUAGES)
         if 'is_set_by_language' in dictionary:
             self.is_set_by_language = dictionary['is_set_by_language']
+        else:
+            self.is_set_by_language = False
         if 'window_width' in dictionary:
             self.window_width = dictionary['window_width']
         if 'window_height_short' in dictionary:
@@ -453,6 +529,13 @@ class Config(object):
             if configset_name not in configset_names:
                 self.languages[language] = default_configset_name
     
+    def compile_ops(self):
+        """Compile the regular expressions of all the SelectionOps."""
+        LOGGER.log()
+        for op in self.ops:
+            # Accessing the property compiles it.
+            op.compiled
+    
     # ConfigSet access
     
     def add_configset(self, configset):
@@ -475,14 +558,14 @@ class Config(object):
         """
         Return the ConfigSet with this name,
         or return the current ConfigSet if no name is given.
+        Return None if there is no ConfigSet with the name.
         """
         LOGGER.log()
         configset_name = configset_name or self.current_configset_name
-        for item in self.configsets:
-            if item.name == configset_name:
-                configset = item
-                break
-        return configset
+        for configset in self.configsets:
+            if configset.name == configset_name:
+                return configset
+        return None
     
     def set_configset(self, configset=None, configset_name=None):
         """
@@ -694,6 +777,7 @@ class Config(object):
         LOGGER.log()
         config_dict = read_dict_from_file(self.filename)
         self.from_dict(config_dict)
+        self.compile_ops()
     
     def save(self):
         """Save the configuration."""
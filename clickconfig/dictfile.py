@@ -72,8 +72,10 @@ def format_value(value, level):
 def read_dict_from_file(filename):
     """Read a text file as a dictionary."""
     file_handle = open(filename, 'r')
-    dict_string = file_handle.read().strip()
-    file_handle.close()
+    try:
+        dict_string = file_handle.read().strip()
+    finally:
+        file_handle.close()
     if dict_string.startswith('{') and dict_string.endswith('}'):
         dictionary = eval(dict_string)
     else:
@@ -75,20 +75,25 @@ class Logger(object):
                       'error': self.logger.error,
                       'critical': self.logger.critical}[level]
             logger(message)
-        elif var:
+            return
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            # Skip inspecting the caller's frame for a message not logged.
+            return
+        if var:
             self.logger.debug('%s: %r' % (var, sys._getframe(1).f_locals[var]))
         else:
             self.logger.debug(whoami())
 
 def whoami():
     """Identify the calling function for logging."""
-    filename = os.path.basename(sys._getframe(2).f_code.co_filename)
-    line = sys._getframe(2).f_lineno
-    if 'self' in sys._getframe(2).f_locals:
-        class_name = sys._getframe(2).f_locals['self'].__class__.__name__
+    frame = sys._getframe(2)
+    filename = os.path.basename(frame.f_code.co_filename)
+    line = frame.f_lineno
+    if 'self' in frame.f_locals:
+        class_name = frame.f_locals['self'].__class__.__name__
     else:
         class_name = '(No class)'
-    function_name = sys._getframe(2).f_code.co_name
+    function_name = frame.f_code.co_name
     return '%s Line %s %s.%s' % (filename, line, class_name, function_name)
 
 def test():
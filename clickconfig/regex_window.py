@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+#  Click_Config plugin for Gedit
+#
+#  Copyright (C) 2010 Derek Veit
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+This module decides whether a SelectionOp regex can be searched in a window
+around the click instead of in the whole line or document.
+
+It works on the parse tree from the standard sre_parse module, so it relies on
+the internals of the re module in Python 2.  Anything it does not recognize is
+treated as position dependent, which is always safe, just slower.
+
+Functions:
+regex_is_position_dependent -- whether a regex must be searched in full
+test -- self test, run when this module is executed at the command line
+
+"""
+
+import re
+import sre_compile
+import sre_constants
+import sre_parse
+import sys
+
+SINGLE_CHAR_CODES = (sre_constants.LITERAL, sre_constants.NOT_LITERAL,
+                     sre_constants.IN, sre_constants.ANY,
+                     sre_constants.CATEGORY)
+"""Parsed regex codes that each match exactly one character."""
+
+REPEAT_CODES = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+"""Parsed regex codes of quantifiers."""
+
+STRUCTURE_CODES = REPEAT_CODES + (sre_constants.AT, sre_constants.BRANCH,
+                                  sre_constants.SUBPATTERN)
+"""Parsed regex codes that consume no characters of their own."""
+
+def regex_is_position_dependent(pattern, flags):
+    """
+    Return True if the matches of the regex could come out differently when
+    the search starts partway into the text, as it does in a search window.
+
+    A regex can be searched in a window if:
+    - each alternative is one character class, optionally repeated without
+      limit, and no two classes share a character, as in '[a-zA-Z]+|[0-9]+';
+    - or it is multiline, and each alternative starts with '^' and cannot
+      match a newline except as its last character, as in '^.*\\n';
+    - or it is multiline and matches a run of whole lines, each starting
+      with '^', optionally followed by part of one more line, as in
+      '(?:^.+\\n)+(?:\\s*\\n)?'.
+    Search windows of multiline regexes start at a line start.  Either way,
+    it must not use \\A, \\Z, \\b, \\B, lookarounds, or (unless it is
+    multiline) ^ or $.
+    """
+    parsed = sre_parse.parse(pattern, flags)
+    for code, value in _iter_codes(parsed):
+        if code in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            return True
+        if code == sre_constants.AT and not (
+                flags & re.M and value in (sre_constants.AT_BEGINNING,
+                                           sre_constants.AT_END)):
+            return True
+    alternatives = _get_alternatives(parsed)
+    if flags & re.M:
+        if all(_starts_at_line_start(alternative) and
+               _is_single_line(alternative, flags)
+               for alternative in alternatives):
+            return False
+        # Alternatives beside a run of lines could split it differently
+        # depending on where the search starts, so it must stand alone.
+        if len(alternatives) == 1 and _is_line_run(alternatives[0], flags):
+            return False
+    char_classes = _get_char_classes(parsed)
+    if char_classes is None:
+        return True
+    return not _are_disjoint(char_classes, parsed, flags)
+
+def _get_subpatterns(code, value):
+    """Return the subpatterns nested in a parsed regex item."""
+    if code == sre_constants.BRANCH:
+        return value[1]
+    elif code in REPEAT_CODES:
+        return [value[2]]
+    elif code in (sre_constants.SUBPATTERN,
+                  sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return [value[1]]
+    elif code == sre_constants.GROUPREF_EXISTS:
+        return [item for item in value[1:] if item]
+    return []
+
+def _iter_codes(parsed):
+    """Yield every item of a parsed regex, including nested items."""
+    for code, value in parsed:
+        yield code, value
+        for subpattern in _get_subpatterns(code, value):
+            for item in _iter_codes(subpattern):
+                yield item
+
+def _get_alternatives(parsed):
+    """Return the top-level alternatives of a parsed regex."""
+    items = list(parsed)
+    if len(items) == 1:
+        code, value = items[0]
+        if code == sre_constants.BRANCH:
+            return value[1]
+        elif code == sre_constants.SUBPATTERN:
+            return _get_alternatives(value[1])
+    return [parsed]
+
+def _get_consuming_items(parsed):
+    """Return the items of a parsed regex, leaving out ^ and $."""
+    return [(code, value) for code, value in parsed
+            if code != sre_constants.AT]
+
+def _starts_at_line_start(parsed):
+    """Return True if every match of a parsed regex starts with '^'."""
+    items = list(parsed)
+    if not items:
+        return False
+    code, value = items[0]
+    if code == sre_constants.AT:
+        return value == sre_constants.AT_BEGINNING
+    elif code in REPEAT_CODES:
+        return value[0] > 0 and _starts_at_line_start(value[2])
+    elif code in (sre_constants.BRANCH, sre_constants.SUBPATTERN):
+        return all(_starts_at_line_start(subpattern) for subpattern in
+                   _get_subpatterns(code, value))
+    return False
+
+def _can_match_newline(parsed, flags):
+    """Return True if a match of a parsed regex could contain a newline."""
+    for code, value in _iter_codes(parsed):
+        if code in SINGLE_CHAR_CODES:
+            char = sre_parse.SubPattern(parsed.pattern, [(code, value)])
+            if sre_compile.compile(char, flags).match(u'\n'):
+                return True
+        elif code not in STRUCTURE_CODES:
+            # Back references and conditionals could match anything.
+            return True
+    return False
+
+def _is_single_line(parsed, flags):
+    """
+    Return True if no match of a parsed regex can contain a newline except
+    as its last character.
+    """
+    items = _get_consuming_items(parsed)
+    if not items:
+        return True
+    for item in items[:-1]:
+        if _can_match_newline(sre_parse.SubPattern(parsed.pattern, [item]),
+                              flags):
+            return False
+    code, value = items[-1]
+    if not _can_match_newline(sre_parse.SubPattern(parsed.pattern, items[-1:]),
+                              flags):
+        return True
+    elif code in SINGLE_CHAR_CODES:
+        return True
+    elif code in REPEAT_CODES and value[1] <= 1:
+        return _is_single_line(value[2], flags)
+    elif code in (sre_constants.BRANCH, sre_constants.SUBPATTERN):
+        return all(_is_single_line(subpattern, flags) for subpattern in
+                   _get_subpatterns(code, value))
+    return False
+
+def _is_whole_line(parsed, flags):
+    """
+    Return True if every match of a parsed regex starts with '^', ends with
+    a newline, and contains no other newline, so it is exactly one line.
+    """
+    items = _get_consuming_items(parsed)
+    return (_starts_at_line_start(parsed) and
+            _is_single_line(parsed, flags) and
+            bool(items) and items[-1] == (sre_constants.LITERAL, ord('\n')))
+
+def _is_line_run(parsed, flags):
+    """
+    Return True if a parsed regex greedily matches one or more whole lines,
+    optionally followed by part of one more line.
+    Every line of the run is matched whole, so the run ends at the same
+    place wherever in it the search started.
+    """
+    items = list(parsed)
+    if not 1 <= len(items) <= 2:
+        return False
+    code, value = items[0]
+    if (code != sre_constants.MAX_REPEAT or value[0] < 1 or
+            value[1] != sre_constants.MAXREPEAT):
+        return False
+    if not all(_is_whole_line(line, flags)
+               for line in _get_alternatives(value[2])):
+        return False
+    if len(items) == 2:
+        code, value = items[1]
+        return (code in REPEAT_CODES and value[0] == 0 and value[1] == 1 and
+                _is_single_line(value[2], flags))
+    return True
+
+def _get_char_classes(parsed):
+    """
+    Return a parsed regex for the character class of each alternative, if
+    each alternative is one character class optionally repeated without
+    limit.  Otherwise, return None.
+    """
+    char_classes = []
+    for alternative in _get_alternatives(parsed):
+        items = list(alternative)
+        if len(items) != 1:
+            return None
+        code, value = items[0]
+        if code in SINGLE_CHAR_CODES:
+            char_classes.append(alternative)
+        elif (code in REPEAT_CODES and value[1] == sre_constants.MAXREPEAT and
+                len(value[2]) == 1 and value[2][0][0] in SINGLE_CHAR_CODES):
+            char_classes.append(value[2])
+        elif code == sre_constants.SUBPATTERN:
+            nested_classes = _get_char_classes(value[1])
+            if nested_classes is None:
+                return None
+            char_classes.extend(nested_classes)
+        else:
+            return None
+    return char_classes
+
+def _are_disjoint(char_classes, parsed, flags):
+    """
+    Return True if no character is matched by more than one of the parsed
+    character classes.
+    Membership can only change at a character given in the regex, so the
+    classes are compared at those characters, their neighbours, and all of
+    Latin-1.  Unicode and locale-dependent categories are not predictable
+    that way, so classes using them are not considered disjoint.
+    """
+    if len(char_classes) < 2:
+        return True
+    if flags & (re.U | re.L):
+        return False
+    chars = set(range(256))
+    for code, value in _iter_codes(parsed):
+        if code == sre_constants.IN:
+            members = value
+        else:
+            members = [(code, value)]
+        for member_code, member_value in members:
+            if member_code in (sre_constants.LITERAL,
+                               sre_constants.NOT_LITERAL):
+                ends = [member_value]
+            elif member_code == sre_constants.RANGE:
+                ends = list(member_value)
+            else:
+                continue
+            for end in ends:
+                chars.update((end - 1, end, end + 1))
+    regexes = [sre_compile.compile(char_class, flags)
+               for char_class in char_classes]
+    for char in chars:
+        if 0 <= char <= sys.maxunicode:
+            text = unichr(char)
+            if sum(1 for regex in regexes if regex.match(text)) > 1:
+                return False
+    return True
+
+def test():
+    """Execute regex_window.py at the command line to run this self test."""
+    cases = [
+        # Searchable in a window.
+        ('[a-zA-Z]+|[0-9]+|[^a-zA-Z0-9]+', 0, False),
+        ('[_a-zA-Z][_a-zA-Z0-9]*', 0, True),
+        ('[^ \\t\\n\\r\\f\\v]*', 0, False),
+        ('^.*$', re.M, False),
+        ('^.*\\n', re.M, False),
+        ('(?:^[ \\t]*\\S[^\\n\\r\\f\\v]*\\n)+', re.M, False),
+        ('(?:^[ \\t]*\\S[^\\n\\r\\f\\v]*\\n)+(?:[ \\t]*\\n)?', re.M, False),
+        # Must be searched in full.
+        ('[a-z]+|[a-c0-9]+', 0, True),
+        ('\\w\\w\\w', 0, True),
+        ('\\bx', 0, True),
+        ('(?<=a)b', 0, True),
+        ('^\\S+', 0, True),
+        ('^.{0,10}', 0, True),
+        ('^.*\\n.*\\n', re.M, True),
+        ('^(?:.*\\n){2}', re.M, True),
+        ('^[^x]*', re.M, True),
+        ('^.*\\n', re.M | re.S, True),
+        ('(?:^.*\\n)+|^x', re.M, True),
+        ('(?:^.*\\n)+?', re.M, True),
+        ('(?:^.*\\n)+.*\\n', re.M, True),
+        ]
+    failures = 0
+    for pattern, flags, expected in cases:
+        result = regex_is_position_dependent(pattern, flags)
+        if result != expected:
+            failures += 1
+        print('%-6s %-50r flags=%-3s dependent=%s' %
+              (('ok', 'FAILED')[result != expected], pattern, flags, result))
+    print('\n%d of %d cases failed.' % (failures, len(cases)))
+    return not failures
+
+if __name__ == '__main__':
+    sys.exit(not test())